@@ -1,14 +1,21 @@
 import base64
+import hashlib
 import os
-from typing import Optional
+import stat
+from functools import lru_cache
+from typing import Iterator, Optional, Tuple
+
+import orjson
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, Response, UploadFile
-from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from fastapi.responses import FileResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 
 from app.config import load_settings
 from app.services import evidence_service
 from app.storage import evidence_repo
-from app.storage.db import get_connection
+from app.storage.db import ConnectionPool
+from app.utils.auth import check_credentials
+from app.utils.ephemeral import get_ephemeral, put_ephemeral
 from app.utils.logging_config import close_log_handlers, configure_logging
 from app.utils.session import create_session, delete_session, get_session
 
@@ -16,18 +23,25 @@ from app.utils.session import create_session, delete_session, get_session
 router = APIRouter()
 
 
-def get_db():
-    settings = load_settings()
-    conn = get_connection(settings.db_path)
-    try:
+def get_db_pool(request: Request) -> ConnectionPool:
+    return request.app.state.db_pool
+
+
+def get_db(pool: ConnectionPool = Depends(get_db_pool)):
+    with pool.reader() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
-def require_login(request: Request):
-    token = request.cookies.get("session_id")
-    session = get_session(token)
+def get_write_db(pool: ConnectionPool = Depends(get_db_pool)):
+    with pool.writer() as conn:
+        yield conn
+
+
+def get_optional_session(request: Request):
+    return get_session(request.cookies.get("session_id"))
+
+
+def require_login(session=Depends(get_optional_session)):
     if not session:
         raise HTTPException(status_code=403, detail="forbidden")
     return session
@@ -40,10 +54,7 @@ def login(
     password: str = Form(...),
 ):
     settings = load_settings()
-    if not (
-        username == settings.basic_auth_user
-        and password == settings.basic_auth_pass
-    ):
+    if not check_credentials(username, password, settings.basic_auth_user, settings.basic_auth_pass):
         raise HTTPException(status_code=401, detail="unauthorized")
     token = create_session(username)
     response.set_cookie("session_id", token, httponly=True, samesite="lax")
@@ -59,50 +70,72 @@ def logout(request: Request, response: Response):
 
 
 @router.get("/api/auth/me")
-def auth_me(request: Request):
-    token = request.cookies.get("session_id")
-    session = get_session(token)
+def auth_me(session=Depends(get_optional_session)):
     if not session:
         return {"authenticated": False}
     return {"authenticated": True, "user": session.get("user")}
 
 
-@router.get("/api/site-info")
-def site_info():
+@lru_cache(maxsize=1)
+def _site_info_payload() -> Tuple[bytes, str]:
     settings = load_settings()
-    return {
-        "icp_info": settings.icp_info,
-        "mps_info": settings.mps_info,
-        "mps_code": settings.mps_code,
-    }
+    body = orjson.dumps(
+        {
+            "icp_info": settings.icp_info,
+            "mps_info": settings.mps_info,
+            "mps_code": settings.mps_code,
+        }
+    )
+    return body, f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+
+
+@router.get("/api/site-info")
+def site_info(request: Request):
+    body, etag = _site_info_payload()
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _parse_digest(hash_value: Optional[str]) -> bytes:
+    if not hash_value:
+        raise HTTPException(status_code=400, detail="hash is required")
+    try:
+        digest = bytes.fromhex(hash_value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid hash hex")
+    if len(digest) != 32:
+        raise HTTPException(status_code=400, detail="hash must be 32 bytes")
+    return digest
 
 
 @router.post("/api/evidence/upload")
-async def upload_evidence(
-    request: Request,
+def upload_evidence(
     hash_value: Optional[str] = Form(None),
     ots_option: Optional[str] = Form(None),
     tsa_option: Optional[str] = Form(None),
     save_option: Optional[str] = Form(None),
     source_name: Optional[str] = Form(None),
-    db=Depends(get_db),
+    pool: ConnectionPool = Depends(get_db_pool),
+    session=Depends(get_optional_session),
 ):
-    if not hash_value:
-        raise HTTPException(status_code=400, detail="hash is required")
+    digest = _parse_digest(hash_value)
     ots_enabled = (ots_option or "enable").lower() != "disable"
     tsa_enabled = (tsa_option or "enable").lower() != "disable"
     save_enabled = (save_option or "enable").lower() != "disable"
-    if save_enabled and not get_session(request.cookies.get("session_id")):
+    if save_enabled and not session:
         raise HTTPException(status_code=403, detail="login required to save")
     if not ots_enabled and not tsa_enabled:
         raise HTTPException(status_code=400, detail="at least one option required")
     name_base = os.path.basename(source_name) if source_name else hash_value
     settings = load_settings()
     result = evidence_service.process_submission(
-        db,
+        pool,
         settings.files_dir,
         settings.tsa_url,
         hash_value,
+        digest,
         ots_enabled,
         tsa_enabled,
         save_record=save_enabled,
@@ -126,44 +159,67 @@ async def upload_evidence(
         }
     else:
         response["download_inline"] = {
-            "ots": {
-                "filename": f"{name_base}.ots",
-                "content_base64": base64.b64encode(result.ots_bytes).decode("ascii"),
-            }
-            if result.ots_bytes
-            else None,
-            "tsa": {
-                "filename": f"{name_base}.tsr",
-                "content_base64": base64.b64encode(result.tsa_bytes).decode("ascii"),
-            }
-            if result.tsa_bytes
-            else None,
+            "ots": _ephemeral_download(f"{name_base}.ots", result.ots_bytes),
+            "tsa": _ephemeral_download(f"{name_base}.tsr", result.tsa_bytes),
         }
     return response
 
 
+def _ephemeral_download(filename: str, content: Optional[bytes]):
+    if not content:
+        return None
+    token = put_ephemeral(load_settings().ephemeral_dir, filename, content)
+    if token is None:
+        return {"filename": filename, "content_base64": base64.b64encode(content).decode("ascii")}
+    return {"filename": filename, "url": f"/api/ephemeral/{token}"}
+
+
+@router.get("/api/ephemeral/{token}")
+def download_ephemeral(token: str):
+    item = get_ephemeral(load_settings().ephemeral_dir, token)
+    if not item:
+        raise HTTPException(status_code=404, detail="file expired")
+    path, filename = item
+    return _file_response(path, filename)
+
+
+_MAX_PROOF_BYTES = 8 * 1024 * 1024
+
+
+def _read_upload(upload: Optional[UploadFile]) -> Optional[bytes]:
+    if upload is None:
+        return None
+    if upload.size is not None and upload.size > _MAX_PROOF_BYTES:
+        raise HTTPException(status_code=413, detail="proof file too large")
+    upload.file.seek(0)
+    content = upload.file.read(_MAX_PROOF_BYTES + 1)
+    if len(content) > _MAX_PROOF_BYTES:
+        raise HTTPException(status_code=413, detail="proof file too large")
+    return content
+
+
 @router.post("/api/evidence/verify")
-async def verify_evidence(
+def verify_evidence(
     hash_value: Optional[str] = Form(None),
     ots_file: Optional[UploadFile] = File(None),
     tsa_file: Optional[UploadFile] = File(None),
     ots_option: Optional[str] = Form(None),
     tsa_option: Optional[str] = Form(None),
-    db=Depends(get_db),
+    pool: ConnectionPool = Depends(get_db_pool),
 ):
-    if not hash_value:
-        raise HTTPException(status_code=400, detail="hash is required")
+    digest = _parse_digest(hash_value)
     ots_enabled = (ots_option or "enable").lower() != "disable"
     tsa_enabled = (tsa_option or "enable").lower() != "disable"
     if not ots_enabled and not tsa_enabled:
         raise HTTPException(status_code=400, detail="at least one option required")
     settings = load_settings()
-    ots_bytes = await ots_file.read() if ots_file else None
-    tsr_bytes = await tsa_file.read() if tsa_file else None
+    ots_bytes = _read_upload(ots_file)
+    tsr_bytes = _read_upload(tsa_file)
     result = evidence_service.verify_submission(
-        db,
+        pool,
         settings.files_dir,
         hash_value,
+        digest,
         ots_enabled,
         tsa_enabled,
         ots_bytes_override=ots_bytes,
@@ -177,10 +233,42 @@ async def verify_evidence(
     return result
 
 
+_LIST_BATCH_SIZE = 500
+
+
+def _stream_evidence_list(pool: ConnectionPool) -> Iterator[bytes]:
+    yield b'{"items":['
+    after_created_at = after_hash = None
+    separator = b""
+    while True:
+        with pool.reader() as db:
+            page = evidence_repo.list_page(db, after_created_at, after_hash, _LIST_BATCH_SIZE)
+        if page:
+            yield separator + b",".join(orjson.dumps(item) for item in page)
+            separator = b","
+        if len(page) < _LIST_BATCH_SIZE:
+            break
+        after_created_at, after_hash = page[-1]["created_at"], page[-1]["hash"]
+    yield b"]}"
+
+
 @router.get("/api/evidence/list", dependencies=[Depends(require_login)])
-def list_evidence(db=Depends(get_db)):
-    items = evidence_repo.list_all(db)
-    return {"items": items}
+def list_evidence(
+    limit: Optional[int] = None,
+    after_created_at: Optional[str] = None,
+    after_hash: Optional[str] = None,
+    pool: ConnectionPool = Depends(get_db_pool),
+):
+    if limit is None:
+        return StreamingResponse(_stream_evidence_list(pool), media_type="application/json")
+    limit = max(1, min(limit, 1000))
+    with pool.reader() as db:
+        items = evidence_repo.list_page(db, after_created_at, after_hash, limit)
+    next_cursor = None
+    if len(items) == limit:
+        last = items[-1]
+        next_cursor = {"after_created_at": last["created_at"], "after_hash": last["hash"]}
+    return {"items": items, "next": next_cursor}
 
 
 @router.get("/api/evidence/{hash_value}", dependencies=[Depends(require_login)])
@@ -192,7 +280,7 @@ def get_evidence(hash_value: str, db=Depends(get_db)):
 
 
 @router.delete("/api/evidence/{hash_value}", dependencies=[Depends(require_login)])
-def delete_evidence(hash_value: str, keep_files: bool = False, db=Depends(get_db)):
+def delete_evidence(hash_value: str, keep_files: bool = False, db=Depends(get_write_db)):
     settings = load_settings()
     ok = evidence_service.delete_evidence(db, settings.files_dir, hash_value, keep_files)
     if not ok:
@@ -200,30 +288,41 @@ def delete_evidence(hash_value: str, keep_files: bool = False, db=Depends(get_db
     return {"deleted": True, "hash": hash_value, "keep_files": keep_files}
 
 
+def _stat_regular_file(path: Optional[str]) -> Optional[os.stat_result]:
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st if stat.S_ISREG(st.st_mode) else None
+
+
 def _file_response(path: Optional[str], filename: str):
-    if not path or not os.path.isfile(path):
+    st = _stat_regular_file(path)
+    if st is None:
         raise HTTPException(status_code=404, detail="file not found")
-    return FileResponse(path, filename=filename)
+    return FileResponse(path, filename=filename, stat_result=st)
 
 
-@router.get("/api/files/{hash_value}/ots")
-def download_ots(hash_value: str, db=Depends(get_db)):
-    record = evidence_repo.fetch_by_hash(db, hash_value)
+def _download_evidence_file(pool: ConnectionPool, hash_value: str, kind: str, suffix: str):
+    with pool.reader() as db:
+        record = evidence_repo.fetch_paths(db, hash_value)
     if not record:
         raise HTTPException(status_code=404, detail="record not found")
-    if record.get("ots_status") != "success":
-        raise HTTPException(status_code=403, detail="ots file not available")
-    return _file_response(record.get("ots_path"), f"{hash_value}.ots")
+    if record.get(f"{kind}_status") != "success":
+        raise HTTPException(status_code=403, detail=f"{kind} file not available")
+    return _file_response(record.get(f"{kind}_path"), f"{hash_value}{suffix}")
+
+
+@router.get("/api/files/{hash_value}/ots")
+def download_ots(hash_value: str, pool: ConnectionPool = Depends(get_db_pool)):
+    return _download_evidence_file(pool, hash_value, "ots", ".ots")
 
 
 @router.get("/api/files/{hash_value}/tsa")
-def download_tsa(hash_value: str, db=Depends(get_db)):
-    record = evidence_repo.fetch_by_hash(db, hash_value)
-    if not record:
-        raise HTTPException(status_code=404, detail="record not found")
-    if record.get("tsa_status") != "success":
-        raise HTTPException(status_code=403, detail="tsa file not available")
-    return _file_response(record.get("tsa_path"), f"{hash_value}.tsr")
+def download_tsa(hash_value: str, pool: ConnectionPool = Depends(get_db_pool)):
+    return _download_evidence_file(pool, hash_value, "tsa", ".tsr")
 
 
 @router.get("/api/logs", dependencies=[Depends(require_login)])
@@ -231,12 +330,13 @@ def list_logs():
     settings = load_settings()
     if not os.path.isdir(settings.logs_dir):
         return {"items": []}
-    items = []
-    for name in sorted(os.listdir(settings.logs_dir)):
-        if not name.endswith(".log"):
-            continue
-        path = os.path.join(settings.logs_dir, name)
-        items.append({"name": name, "size": os.path.getsize(path)})
+    with os.scandir(settings.logs_dir) as entries:
+        items = [
+            {"name": entry.name, "size": entry.stat().st_size}
+            for entry in entries
+            if entry.name.endswith(".log")
+        ]
+    items.sort(key=lambda item: item["name"])
     return {"items": items}
 
 
@@ -246,9 +346,39 @@ def download_log(name: str):
     if "/" in name or "\\" in name:
         raise HTTPException(status_code=400, detail="invalid log name")
     path = os.path.join(settings.logs_dir, name)
-    if not os.path.isfile(path):
+    st = _stat_regular_file(path)
+    if st is None:
         raise HTTPException(status_code=404, detail="log not found")
-    return FileResponse(path, filename=name)
+    return FileResponse(path, filename=name, stat_result=st)
+
+
+_TAIL_CHUNK_SIZE = 64 * 1024
+
+
+def _tail_text(path: str, limit: int) -> str:
+    with open(path, "rb") as handle:
+        if limit <= 0:
+            data = handle.read()
+        else:
+            handle.seek(0, os.SEEK_END)
+            pos = handle.tell()
+            chunks = []
+            newlines = 0
+            while pos > 0 and newlines <= limit:
+                step = min(_TAIL_CHUNK_SIZE, pos)
+                pos -= step
+                handle.seek(pos)
+                chunk = handle.read(step)
+                chunks.append(chunk)
+                newlines += chunk.count(b"\n")
+            data = b"".join(reversed(chunks))
+            start = len(data) - 1 if data.endswith(b"\n") else len(data)
+            for _ in range(limit):
+                start = data.rfind(b"\n", 0, start)
+                if start < 0:
+                    break
+            data = data[start + 1 :]
+    return data.decode("utf-8", errors="replace").replace("\r\n", "\n")
 
 
 @router.get("/api/logs/{name}/view", dependencies=[Depends(require_login)])
@@ -257,16 +387,12 @@ def view_log(name: str, limit: int = 200):
     if "/" in name or "\\" in name:
         raise HTTPException(status_code=400, detail="invalid log name")
     path = os.path.join(settings.logs_dir, name)
-    if not os.path.isfile(path):
+    if _stat_regular_file(path) is None:
         raise HTTPException(status_code=404, detail="log not found")
     try:
-        with open(path, "r", encoding="utf-8", errors="replace") as handle:
-            lines = handle.readlines()
+        content = _tail_text(path, limit)
     except OSError:
         raise HTTPException(status_code=500, detail="read log failed")
-    if limit > 0:
-        lines = lines[-limit:]
-    content = "".join(lines)
     return PlainTextResponse(content)
 
 
@@ -276,14 +402,14 @@ def delete_log(name: str):
     if "/" in name or "\\" in name:
         raise HTTPException(status_code=400, detail="invalid log name")
     path = os.path.join(settings.logs_dir, name)
-    if not os.path.isfile(path):
+    if _stat_regular_file(path) is None:
         raise HTTPException(status_code=404, detail="log not found")
     try:
         close_log_handlers(path)
         os.remove(path)
         configure_logging(settings.logs_dir)
-        return JSONResponse({"deleted": True, "name": name})
+        return ORJSONResponse({"deleted": True, "name": name})
     except PermissionError:
         with open(path, "w", encoding="utf-8"):
             pass
-        return JSONResponse({"deleted": False, "cleared": True, "name": name})
+        return ORJSONResponse({"deleted": False, "cleared": True, "name": name})
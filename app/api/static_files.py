@@ -0,0 +1,79 @@
+import gzip
+import mimetypes
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+
+_COMPRESSIBLE_PREFIXES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+@dataclass(frozen=True)
+class StaticEntry:
+    path: str
+    media_type: str
+    etag: str
+    gzip_etag: str
+    stat_result: os.stat_result
+    gzip_bytes: Optional[bytes]
+
+
+def _load_entry(path: str) -> StaticEntry:
+    st = os.stat(path)
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    gzip_bytes = None
+    if media_type.startswith(_COMPRESSIBLE_PREFIXES):
+        with open(path, "rb") as handle:
+            raw = handle.read()
+        compressed = gzip.compress(raw, compresslevel=9, mtime=0)
+        if len(compressed) < len(raw):
+            gzip_bytes = compressed
+    tag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+    return StaticEntry(
+        path=path,
+        media_type=media_type,
+        etag=f'"{tag}"',
+        gzip_etag=f'"{tag}-gz"',
+        stat_result=st,
+        gzip_bytes=gzip_bytes,
+    )
+
+
+def load_static_entries(static_dir: str) -> Dict[str, StaticEntry]:
+    entries: Dict[str, StaticEntry] = {}
+    for root, _dirs, files in os.walk(static_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            entries[rel] = _load_entry(path)
+    return entries
+
+
+def build_static_router(static_dir: str) -> APIRouter:
+    entries = load_static_entries(static_dir)
+    router = APIRouter()
+
+    @router.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+    def static_file(path: str, request: Request):
+        entry = entries.get(path)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        use_gzip = entry.gzip_bytes is not None and "gzip" in request.headers.get("accept-encoding", "")
+        etag = entry.gzip_etag if use_gzip else entry.etag
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=entry.gzip_bytes, media_type=entry.media_type, headers=headers)
+        return FileResponse(
+            entry.path,
+            media_type=entry.media_type,
+            headers=headers,
+            stat_result=entry.stat_result,
+        )
+
+    return router
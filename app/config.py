@@ -1,5 +1,21 @@
 ﻿import os
 from dataclasses import dataclass
+from functools import lru_cache
+
+_DEFAULT_TSA_URL = "https://freetsa.org/tsr"
+_DEFAULT_CALENDAR_URLS = (
+    "https://a.pool.opentimestamps.org",
+    "https://b.pool.opentimestamps.org",
+    "https://a.pool.eternitywall.com",
+    "https://ots.btc.catallaxy.com",
+    "https://alice.btc.calendar.opentimestamps.org/",
+)
+_DEFAULT_BTC_BLOCK_HASH_API = "https://blockstream.info/api/block-height/{height}"
+_DEFAULT_LTC_BLOCK_HASH_API = "https://sochain.com/api/v2/get_block/LTC/{height}"
+_DEFAULT_BTC_EXPLORER_BLOCK_URL = "https://blockchair.com/bitcoin/block/{hash}"
+_DEFAULT_LTC_EXPLORER_BLOCK_URL = "https://blockchair.com/litecoin/block/{hash}"
+_DEFAULT_BTC_EXPLORER_HEIGHT_URL = "https://blockchair.com/bitcoin/block/{height}"
+_DEFAULT_LTC_EXPLORER_HEIGHT_URL = "https://blockchair.com/litecoin/block/{height}"
 
 
 def _default_data_dir() -> str:
@@ -25,61 +41,52 @@ class Settings:
     db_dir: str
     files_dir: str
     logs_dir: str
+    ephemeral_dir: str
     db_path: str
     basic_auth_user: str
     basic_auth_pass: str
     icp_info: str
     mps_info: str
     mps_code: str
+    session_backend: str
+    redis_url: str
 
 
+@lru_cache(maxsize=1)
 def load_settings() -> Settings:
     data_dir = _default_data_dir()
     db_dir = os.path.join(data_dir, "db")
     files_dir = os.path.join(data_dir, "files")
     logs_dir = os.path.join(data_dir, "logs")
+    ephemeral_dir = os.path.join(data_dir, "ephemeral")
     db_path = os.path.join(db_dir, "evidence.db")
-    tsa_url = os.environ.get("TSA_URL", "https://freetsa.org/tsr").strip()
-    calendar_default = ",".join(
-        [
-            "https://a.pool.opentimestamps.org",
-            "https://b.pool.opentimestamps.org",
-            "https://a.pool.eternitywall.com",
-            "https://ots.btc.catallaxy.com",
-            "https://alice.btc.calendar.opentimestamps.org/",
-        ]
-    )
-    calendar_env = os.environ.get("OTS_CALENDAR_URLS", calendar_default)
-    ots_calendar_urls = [item.strip() for item in calendar_env.split(",") if item.strip()]
-    btc_block_hash_api = os.environ.get(
-        "BTC_BLOCK_HASH_API",
-        "https://blockstream.info/api/block-height/{height}",
-    ).strip()
-    ltc_block_hash_api = os.environ.get(
-        "LTC_BLOCK_HASH_API",
-        "https://sochain.com/api/v2/get_block/LTC/{height}",
-    ).strip()
+    tsa_url = os.environ.get("TSA_URL", _DEFAULT_TSA_URL).strip()
+    calendar_env = os.environ.get("OTS_CALENDAR_URLS")
+    if calendar_env is None:
+        ots_calendar_urls = list(_DEFAULT_CALENDAR_URLS)
+    else:
+        ots_calendar_urls = [item.strip() for item in calendar_env.split(",") if item.strip()]
+    btc_block_hash_api = os.environ.get("BTC_BLOCK_HASH_API", _DEFAULT_BTC_BLOCK_HASH_API).strip()
+    ltc_block_hash_api = os.environ.get("LTC_BLOCK_HASH_API", _DEFAULT_LTC_BLOCK_HASH_API).strip()
     btc_explorer_block_url = os.environ.get(
-        "BTC_EXPLORER_BLOCK_URL",
-        "https://blockchair.com/bitcoin/block/{hash}",
+        "BTC_EXPLORER_BLOCK_URL", _DEFAULT_BTC_EXPLORER_BLOCK_URL
     ).strip()
     ltc_explorer_block_url = os.environ.get(
-        "LTC_EXPLORER_BLOCK_URL",
-        "https://blockchair.com/litecoin/block/{hash}",
+        "LTC_EXPLORER_BLOCK_URL", _DEFAULT_LTC_EXPLORER_BLOCK_URL
     ).strip()
     btc_explorer_height_url = os.environ.get(
-        "BTC_EXPLORER_HEIGHT_URL",
-        "https://blockchair.com/bitcoin/block/{height}",
+        "BTC_EXPLORER_HEIGHT_URL", _DEFAULT_BTC_EXPLORER_HEIGHT_URL
     ).strip()
     ltc_explorer_height_url = os.environ.get(
-        "LTC_EXPLORER_HEIGHT_URL",
-        "https://blockchair.com/litecoin/block/{height}",
+        "LTC_EXPLORER_HEIGHT_URL", _DEFAULT_LTC_EXPLORER_HEIGHT_URL
     ).strip()
     basic_auth_user = os.environ.get("BASIC_AUTH_USER", "admin")
     basic_auth_pass = os.environ.get("BASIC_AUTH_PASS", "admin")
     icp_info = os.environ.get("ICP_INFO") or os.environ.get("ICP-INFO") or ""
     mps_info = os.environ.get("MPS_INFO") or os.environ.get("MPS-INFO") or ""
     mps_code = os.environ.get("MPS_CODE") or os.environ.get("MPS-CODE") or ""
+    session_backend = os.environ.get("SESSION_BACKEND", "memory").strip().lower()
+    redis_url = os.environ.get("REDIS_URL", "redis://localhost:6379/0").strip()
     return Settings(
         tsa_url=tsa_url,
         ots_calendar_urls=ots_calendar_urls,
@@ -93,10 +100,13 @@ def load_settings() -> Settings:
         db_dir=db_dir,
         files_dir=files_dir,
         logs_dir=logs_dir,
+        ephemeral_dir=ephemeral_dir,
         db_path=db_path,
         basic_auth_user=basic_auth_user,
         basic_auth_pass=basic_auth_pass,
         icp_info=icp_info,
         mps_info=mps_info,
         mps_code=mps_code,
+        session_backend=session_backend,
+        redis_url=redis_url,
     )
@@ -1,27 +1,40 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 from fastapi.responses import Response
 from fastapi.responses import RedirectResponse
 
 from app.api.routes import router
+from app.api.static_files import build_static_router
 from app.config import load_settings
-from app.storage.db import migrate
+from app.storage.db import ConnectionPool, migrate
+from app.utils.locks import file_lock
 from app.utils.session import get_session
-from app.utils.logging_config import configure_logging
+from app.utils.logging_config import close_all_log_handlers, configure_logging
 from app.utils.paths import ensure_dirs
 
 
 def create_app() -> FastAPI:
     settings = load_settings()
-    ensure_dirs([settings.db_dir, settings.files_dir, settings.logs_dir])
-    configure_logging(settings.logs_dir)
-    logging.getLogger("app").info("starting application")
-    migrate(settings.db_path)
-
-    app = FastAPI()
+    ensure_dirs([settings.db_dir, settings.files_dir, settings.logs_dir, settings.ephemeral_dir])
+    with file_lock(os.path.join(settings.db_dir, "migrate.lock")):
+        migrate(settings.db_path)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        configure_logging(settings.logs_dir)
+        logging.getLogger("app").info("starting application")
+        app.state.db_pool = ConnectionPool(settings.db_path)
+        try:
+            yield
+        finally:
+            app.state.db_pool.close()
+            close_all_log_handlers(settings.logs_dir)
+
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
     @app.middleware("http")
     async def session_guard_middleware(request: Request, call_next):
@@ -38,7 +51,7 @@ def create_app() -> FastAPI:
     app.include_router(router)
     static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "static"))
     if os.path.isdir(static_dir):
-        app.mount("/static", StaticFiles(directory=static_dir), name="static")
+        app.include_router(build_static_router(static_dir))
     return app
 
 
@@ -0,0 +1,3 @@
+DROP INDEX IF EXISTS idx_evidences_created_at;
+
+CREATE INDEX IF NOT EXISTS idx_evidences_created_at_hash ON evidences(created_at, hash);
@@ -1,6 +1,6 @@
 import logging
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from app.config import load_settings
 from app.services.ots_service import create_ots, verify_ots
@@ -8,8 +8,8 @@ from app.services.tsa_service import create_tsa, verify_tsa
 from app.services.storage_service import (
     delete_evidence_files,
     read_file,
-    save_ots_file,
-    save_tsa_file,
+    save_evidence_files,
+    write_file_atomic,
 )
 from app.storage import evidence_repo
 
@@ -36,11 +36,20 @@ def _status_from_result(success: bool) -> str:
     return "success" if success else "failed"
 
 
+def _keep_committed(
+    current: Optional[Dict[str, Any]], kind: str, status: str, path: Optional[str]
+) -> Tuple[str, Optional[str]]:
+    if status != "success" and current and current[f"{kind}_status"] == "success":
+        return "success", current[f"{kind}_path"]
+    return status, path
+
+
 def process_submission(
-    conn,
+    pool,
     files_dir: str,
     tsa_url: str,
     hash_value: str,
+    digest: bytes,
     ots_enabled: bool,
     tsa_enabled: bool,
     save_record: bool = True,
@@ -51,29 +60,22 @@ def process_submission(
     tsa_info: Dict[str, Any] = {}
     ots_bytes: Optional[bytes] = None
     tsa_bytes: Optional[bytes] = None
+    calendars = load_settings().ots_calendar_urls
 
     if save_record:
-        existing = evidence_repo.fetch_by_hash(conn, hash_value)
+        with pool.reader() as conn:
+            existing = evidence_repo.fetch_by_hash(conn, hash_value)
         if existing:
             ots_status = existing["ots_status"]
             tsa_status = existing["tsa_status"]
         else:
             ots_status = "pending"
             tsa_status = "pending"
-            evidence_repo.insert_or_ignore(
-                conn,
-                {
-                    "hash": hash_value,
-                    "ots_status": ots_status,
-                    "tsa_status": tsa_status,
-                    "ots_path": None,
-                    "tsa_path": None,
-                },
-            )
-            existing = evidence_repo.fetch_by_hash(conn, hash_value)
 
         ots_path = existing.get("ots_path") if existing else None
         tsa_path = existing.get("tsa_path") if existing else None
+        new_ots_bytes: Optional[bytes] = None
+        new_tsr_bytes: Optional[bytes] = None
         if ots_status == "success" and not read_file(ots_path):
             ots_status = "failed"
         if tsa_status == "success" and not read_file(tsa_path):
@@ -81,36 +83,53 @@ def process_submission(
 
         if ots_status != "success":
             if ots_enabled:
-                ots_result = create_ots(hash_value, calendars=load_settings().ots_calendar_urls)
+                ots_result = create_ots(digest, calendars=calendars)
                 ots_status = _status_from_result(ots_result.success)
                 ots_error = ots_result.error
                 if ots_result.success and ots_result.ots_bytes:
-                    ots_path = save_ots_file(files_dir, hash_value, ots_result.ots_bytes)
+                    new_ots_bytes = ots_result.ots_bytes
             else:
                 ots_status = "disabled"
                 ots_error = "ots disabled"
 
         if tsa_status != "success":
             if tsa_enabled:
-                tsa_result = create_tsa(hash_value, tsa_url)
+                tsa_result = create_tsa(digest, tsa_url)
                 tsa_status = _status_from_result(tsa_result.success)
                 tsa_error = tsa_result.error
                 tsa_info = tsa_result.info or {}
                 if tsa_result.success and tsa_result.tsr_bytes:
-                    tsa_path = save_tsa_file(files_dir, hash_value, tsa_result.tsr_bytes)
+                    new_tsr_bytes = tsa_result.tsr_bytes
             else:
                 tsa_status = "disabled"
                 tsa_error = "tsa disabled"
                 tsa_info = {}
 
-        evidence_repo.update_statuses(conn, hash_value, ots_status, tsa_status, ots_path, tsa_path)
-        record = evidence_repo.fetch_by_hash(conn, hash_value) or {}
+        saved_ots_path, saved_tsa_path = save_evidence_files(
+            files_dir, hash_value, new_ots_bytes, new_tsr_bytes
+        )
+        ots_path = saved_ots_path or ots_path
+        tsa_path = saved_tsa_path or tsa_path
+        with pool.writer() as conn, evidence_repo.transaction(conn):
+            current = evidence_repo.fetch_by_hash(conn, hash_value, use_cache=False)
+            ots_status, ots_path = _keep_committed(current, "ots", ots_status, ots_path)
+            tsa_status, tsa_path = _keep_committed(current, "tsa", tsa_status, tsa_path)
+            record = evidence_repo.upsert_with_statuses(
+                conn,
+                {
+                    "hash": hash_value,
+                    "ots_status": ots_status,
+                    "tsa_status": tsa_status,
+                    "ots_path": ots_path,
+                    "tsa_path": tsa_path,
+                },
+            )
     else:
         ots_status = "pending"
         tsa_status = "pending"
 
         if ots_enabled:
-            ots_result = create_ots(hash_value, calendars=load_settings().ots_calendar_urls)
+            ots_result = create_ots(digest, calendars=calendars)
             ots_status = _status_from_result(ots_result.success)
             ots_error = ots_result.error
             if ots_result.success and ots_result.ots_bytes:
@@ -120,7 +139,7 @@ def process_submission(
             ots_error = "ots disabled"
 
         if tsa_enabled:
-            tsa_result = create_tsa(hash_value, tsa_url)
+            tsa_result = create_tsa(digest, tsa_url)
             tsa_status = _status_from_result(tsa_result.success)
             tsa_error = tsa_result.error
             tsa_info = tsa_result.info or {}
@@ -155,15 +174,17 @@ def process_submission(
 
 
 def verify_submission(
-    conn,
+    pool,
     files_dir: str,
     hash_value: str,
+    digest: bytes,
     ots_enabled: bool,
     tsa_enabled: bool,
     ots_bytes_override: Optional[bytes] = None,
     tsr_bytes_override: Optional[bytes] = None,
 ) -> Dict[str, Any]:
-    record = evidence_repo.fetch_by_hash(conn, hash_value)
+    with pool.reader() as conn:
+        record = evidence_repo.fetch_by_hash(conn, hash_value)
     ots_info: Dict[str, Any] = {"success": False}
     tsa_info: Dict[str, Any] = {"success": False}
 
@@ -172,11 +193,16 @@ def verify_submission(
         if not ots_bytes and record:
             ots_bytes = read_file(record.get("ots_path"))
         if ots_bytes:
-            ots_result = verify_ots(ots_bytes, hash_hex=hash_value)
+            ots_result = verify_ots(ots_bytes, digest=digest)
             ots_info = {"success": ots_result.success, "error": ots_result.error, "info": ots_result.info}
-            if record and ots_result.updated_ots_bytes and record.get("ots_path"):
-                with open(record["ots_path"], "wb") as handle:
-                    handle.write(ots_result.updated_ots_bytes)
+            updated_ots_bytes = ots_result.updated_ots_bytes
+            if (
+                record
+                and updated_ots_bytes
+                and record.get("ots_path")
+                and updated_ots_bytes != ots_bytes
+            ):
+                write_file_atomic(record["ots_path"], updated_ots_bytes)
         elif not record:
             ots_info = {"success": False, "error": "ots file required when record missing"}
         else:
@@ -189,7 +215,7 @@ def verify_submission(
         if not tsr_bytes and record:
             tsr_bytes = read_file(record.get("tsa_path"))
         if tsr_bytes:
-            tsa_result = verify_tsa(tsr_bytes, hash_hex=hash_value)
+            tsa_result = verify_tsa(tsr_bytes, digest=digest)
             tsa_info = {"success": tsa_result.success, "error": tsa_result.error, "info": tsa_result.info}
         elif not record:
             tsa_info = {"success": False, "error": "tsa file required when record missing"}
@@ -213,6 +239,7 @@ def delete_evidence(conn, files_dir: str, hash_value: str, keep_files: bool) ->
         return False
     if not keep_files:
         delete_evidence_files(files_dir, hash_value)
-    evidence_repo.delete_by_hash(conn, hash_value)
+    with evidence_repo.transaction(conn):
+        evidence_repo.delete_by_hash(conn, hash_value)
     logger.info("evidence deleted hash=%s keep_files=%s", hash_value, keep_files)
     return True
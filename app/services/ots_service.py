@@ -1,13 +1,49 @@
 import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from types import SimpleNamespace
 from typing import Any, Dict, Optional, Tuple, Callable, List, Tuple as Tup
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from app.config import load_settings
+from app.config import Settings, load_settings
 
 logger = logging.getLogger("app")
 
+_CALENDAR_TIMEOUT_SECONDS = 10
+_CALENDAR_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ots-calendar")
+
+
+def _build_http_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=1, read=0, backoff_factor=0.1),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": "valid-tools", "Connection": "keep-alive"})
+    return session
+
+
+_HTTP = _build_http_session()
+
+_BLOCK_HASH_TTL_SECONDS = 6 * 60 * 60
+_BLOCK_HASH_CACHE_MAX_SIZE = 4096
+_BLOCK_HASH_CACHE: "OrderedDict[Tuple[str, int], Tuple[float, str]]" = OrderedDict()
+_BLOCK_HASH_LOCK = threading.Lock()
+_BLOCK_HASH_TIMEOUT = (2, 4)
+_BLOCK_HASH_BUDGET_SECONDS = 6
+_BLOCK_HASH_MAX_REFRESHES = 32
+_BLOCK_HASH_REFRESHING: set = set()
+_BLOCK_HASH_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ots-block-hash")
+
 
 @dataclass(frozen=True)
 class OTSResult:
@@ -39,27 +75,57 @@ def _load_ots_client() -> Tuple[Optional[Tuple[Callable, Callable, Any]], Option
     return None, primary_error
 
 
-def _create_ots_with_calendar(hash_hex: str, calendars: List[str]) -> OTSResult:
+def _load_ots_core() -> Tuple[Optional[SimpleNamespace], Optional[str]]:
     try:
         from opentimestamps.calendar import RemoteCalendar  # type: ignore
+        from opentimestamps.core import notary  # type: ignore
         from opentimestamps.core.op import OpSHA256  # type: ignore
-        from opentimestamps.core.serialize import BytesSerializationContext  # type: ignore
+        from opentimestamps.core.serialize import (  # type: ignore
+            BytesDeserializationContext,
+            BytesSerializationContext,
+        )
         from opentimestamps.core.timestamp import DetachedTimestampFile, Timestamp  # type: ignore
     except Exception as exc:
-        return OTSResult(success=False, error=f"opentimestamps core unavailable: {exc}", info={})
+        return None, f"opentimestamps core unavailable: {exc}"
+    return (
+        SimpleNamespace(
+            RemoteCalendar=RemoteCalendar,
+            notary=notary,
+            OpSHA256=OpSHA256,
+            BytesDeserializationContext=BytesDeserializationContext,
+            BytesSerializationContext=BytesSerializationContext,
+            DetachedTimestampFile=DetachedTimestampFile,
+            Timestamp=Timestamp,
+        ),
+        None,
+    )
+
+
+_OTS_CLIENT, _OTS_CLIENT_ERROR = _load_ots_client()
+_OTS, _OTS_ERROR = _load_ots_core()
+
+
+def _create_ots_with_calendar(digest: bytes, calendars: List[str]) -> OTSResult:
+    core = _OTS
+    if core is None:
+        return OTSResult(success=False, error=_OTS_ERROR, info={})
 
     if not calendars:
         return OTSResult(success=False, error="no calendars configured", info={})
-    digest = bytes.fromhex(hash_hex)
-    base_ts = Timestamp(digest)
+    base_ts = core.Timestamp(digest)
     errors = []
     success_count = 0
 
-    for url in calendars:
+    futures = {
+        _CALENDAR_EXECUTOR.submit(
+            core.RemoteCalendar(url).submit, digest, timeout=_CALENDAR_TIMEOUT_SECONDS
+        ): url
+        for url in calendars
+    }
+    for future in as_completed(futures):
+        url = futures[future]
         try:
-            cal = RemoteCalendar(url)
-            cal_ts = cal.submit(digest)
-            base_ts.merge(cal_ts)
+            base_ts.merge(future.result())
             success_count += 1
         except Exception as exc:
             errors.append(f"{url}: {exc}")
@@ -67,8 +133,8 @@ def _create_ots_with_calendar(hash_hex: str, calendars: List[str]) -> OTSResult:
     if success_count == 0:
         return OTSResult(success=False, error="all calendars failed", info={"errors": errors})
 
-    detached = DetachedTimestampFile(OpSHA256(), base_ts)
-    ctx = BytesSerializationContext()
+    detached = core.DetachedTimestampFile(core.OpSHA256(), base_ts)
+    ctx = core.BytesSerializationContext()
     detached.serialize(ctx)
     return OTSResult(
         success=True,
@@ -78,30 +144,124 @@ def _create_ots_with_calendar(hash_hex: str, calendars: List[str]) -> OTSResult:
     )
 
 
-def _collect_attestation_info(timestamp) -> Dict[str, Any]:
-    try:
-        from opentimestamps.core import notary  # type: ignore
-    except Exception:
-        return {}
+@dataclass(frozen=True)
+class _TimestampScan:
+    attestation_types: List[str]
+    pending: List[Tuple[Any, Any]]
+    blockchain: List[Tuple[str, int]]
+
+
+def _scan_timestamp(timestamp) -> Optional[_TimestampScan]:
+    if _OTS is None:
+        return None
+    notary = _OTS.notary
     types: List[str] = []
-    has_blockchain = False
-    has_pending = False
-    for _msg, att in timestamp.all_attestations():
-        types.append(att.__class__.__name__)
-        if isinstance(att, (notary.BitcoinBlockHeaderAttestation, notary.LitecoinBlockHeaderAttestation)):
-            has_blockchain = True
-        if isinstance(att, notary.PendingAttestation):
-            has_pending = True
+    pending: List[Tuple[Any, Any]] = []
+    blockchain: List[Tuple[str, int]] = []
+    seen = set()
+
+    def walk(node) -> None:
+        for att in node.attestations:
+            types.append(att.__class__.__name__)
+            if isinstance(att, notary.PendingAttestation):
+                pending.append((node, att))
+                continue
+            if isinstance(att, notary.BitcoinBlockHeaderAttestation):
+                key = ("bitcoin", int(att.height))
+            elif isinstance(att, notary.LitecoinBlockHeaderAttestation):
+                key = ("litecoin", int(att.height))
+            else:
+                continue
+            if key not in seen:
+                seen.add(key)
+                blockchain.append(key)
+        for child in node.ops.values():
+            walk(child)
+
+    walk(timestamp)
+    return _TimestampScan(attestation_types=types, pending=pending, blockchain=blockchain)
+
+
+def _attestation_summary(scan: Optional[_TimestampScan]) -> Dict[str, Any]:
+    if scan is None:
+        return {}
     return {
-        "attestations": len(types),
-        "attestation_types": types,
-        "has_blockchain_proof": has_blockchain,
-        "has_pending_attestations": has_pending,
+        "attestations": len(scan.attestation_types),
+        "attestation_types": scan.attestation_types,
+        "has_blockchain_proof": bool(scan.blockchain),
+        "has_pending_attestations": bool(scan.pending),
     }
 
 
-def _lookup_block_hash(chain: str, height: int) -> Tuple[Optional[str], Optional[str]]:
-    settings = load_settings()
+def _collect_attestation_info(timestamp) -> Dict[str, Any]:
+    return _attestation_summary(_scan_timestamp(timestamp))
+
+
+def _cached_block_hash(key: Tuple[str, int]) -> Tuple[Optional[str], bool]:
+    with _BLOCK_HASH_LOCK:
+        entry = _BLOCK_HASH_CACHE.get(key)
+        if entry is None:
+            return None, False
+        expires_at, block_hash = entry
+        remaining = expires_at - time.monotonic()
+        if remaining < 0:
+            del _BLOCK_HASH_CACHE[key]
+            return None, False
+        _BLOCK_HASH_CACHE.move_to_end(key)
+        return block_hash, remaining < _BLOCK_HASH_TTL_SECONDS / 2
+
+
+def _store_block_hash(key: Tuple[str, int], block_hash: str) -> None:
+    with _BLOCK_HASH_LOCK:
+        _BLOCK_HASH_CACHE[key] = (time.monotonic() + _BLOCK_HASH_TTL_SECONDS, block_hash)
+        _BLOCK_HASH_CACHE.move_to_end(key)
+        while len(_BLOCK_HASH_CACHE) > _BLOCK_HASH_CACHE_MAX_SIZE:
+            _BLOCK_HASH_CACHE.popitem(last=False)
+
+
+def _refresh_block_hash(settings: Settings, key: Tuple[str, int]) -> None:
+    try:
+        block_hash, _error = _fetch_block_hash(settings, *key)
+        if block_hash:
+            _store_block_hash(key, block_hash)
+    finally:
+        with _BLOCK_HASH_LOCK:
+            _BLOCK_HASH_REFRESHING.discard(key)
+
+
+def _schedule_block_hash_refresh(settings: Settings, key: Tuple[str, int]) -> None:
+    with _BLOCK_HASH_LOCK:
+        if key in _BLOCK_HASH_REFRESHING or len(_BLOCK_HASH_REFRESHING) >= _BLOCK_HASH_MAX_REFRESHES:
+            return
+        _BLOCK_HASH_REFRESHING.add(key)
+    try:
+        _BLOCK_HASH_EXECUTOR.submit(_refresh_block_hash, settings, key)
+    except RuntimeError:
+        with _BLOCK_HASH_LOCK:
+            _BLOCK_HASH_REFRESHING.discard(key)
+
+
+def _lookup_block_hash(
+    settings: Settings, chain: str, height: int, deadline: float
+) -> Tuple[Optional[str], Optional[str]]:
+    cached, stale = _cached_block_hash((chain, height))
+    if cached is not None:
+        if stale:
+            _schedule_block_hash_refresh(settings, (chain, height))
+        return cached, None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return None, "timeout"
+    timeout = (min(_BLOCK_HASH_TIMEOUT[0], remaining), min(_BLOCK_HASH_TIMEOUT[1], remaining))
+    block_hash, error = _fetch_block_hash(settings, chain, height, timeout)
+    if block_hash:
+        _store_block_hash((chain, height), block_hash)
+    return block_hash, error
+
+
+def _fetch_block_hash(
+    settings: Settings, chain: str, height: int, timeout: Tuple[float, float] = _BLOCK_HASH_TIMEOUT
+) -> Tuple[Optional[str], Optional[str]]:
     if chain == "bitcoin":
         api_template = settings.btc_block_hash_api
     elif chain == "litecoin":
@@ -112,7 +272,7 @@ def _lookup_block_hash(chain: str, height: int) -> Tuple[Optional[str], Optional
         return None, "block hash api disabled"
     url = api_template.format(height=height)
     try:
-        resp = requests.get(url, timeout=8)
+        resp = _HTTP.get(url, timeout=timeout)
         if not resp.ok:
             return None, f"api status {resp.status_code}"
         text = resp.text.strip()
@@ -131,8 +291,9 @@ def _lookup_block_hash(chain: str, height: int) -> Tuple[Optional[str], Optional
         return None, str(exc)
 
 
-def _build_explorer_url(chain: str, height: int, block_hash: Optional[str]) -> Optional[str]:
-    settings = load_settings()
+def _build_explorer_url(
+    settings: Settings, chain: str, height: int, block_hash: Optional[str]
+) -> Optional[str]:
     if chain == "bitcoin":
         block_template = settings.btc_explorer_block_url
         height_template = settings.btc_explorer_height_url
@@ -148,35 +309,19 @@ def _build_explorer_url(chain: str, height: int, block_hash: Optional[str]) -> O
     return None
 
 
-def _collect_blockchain_proofs(timestamp) -> List[Dict[str, Any]]:
-    try:
-        from opentimestamps.core import notary  # type: ignore
-    except Exception:
+def _blockchain_proofs(scan: Optional[_TimestampScan]) -> List[Dict[str, Any]]:
+    if scan is None:
         return []
+    settings = load_settings()
     proofs: List[Dict[str, Any]] = []
-    seen = set()
-    cache: Dict[Tuple[str, int], Tuple[Optional[str], Optional[str]]] = {}
-    for _msg, att in timestamp.all_attestations():
-        chain = None
-        if isinstance(att, notary.BitcoinBlockHeaderAttestation):
-            chain = "bitcoin"
-        elif isinstance(att, notary.LitecoinBlockHeaderAttestation):
-            chain = "litecoin"
-        if not chain:
-            continue
-        height = int(att.height)
-        key = (chain, height)
-        if key in seen:
-            continue
-        seen.add(key)
-        if key not in cache:
-            cache[key] = _lookup_block_hash(chain, height)
-        block_hash, hash_error = cache[key]
+    deadline = time.monotonic() + _BLOCK_HASH_BUDGET_SECONDS
+    for chain, height in scan.blockchain:
+        block_hash, hash_error = _lookup_block_hash(settings, chain, height, deadline)
         proof = {
             "chain": chain,
             "height": height,
             "block_hash": block_hash,
-            "explorer_url": _build_explorer_url(chain, height, block_hash),
+            "explorer_url": _build_explorer_url(settings, chain, height, block_hash),
         }
         if hash_error:
             proof["block_hash_error"] = hash_error
@@ -184,31 +329,12 @@ def _collect_blockchain_proofs(timestamp) -> List[Dict[str, Any]]:
     return proofs
 
 
-def _collect_pending_attestations(timestamp) -> List[Tuple[Any, Any]]:
-    try:
-        from opentimestamps.core import notary  # type: ignore
-    except Exception:
-        return []
-    pending: List[Tuple[Any, Any]] = []
-
-    def walk(node) -> None:
-        for att in node.attestations:
-            if isinstance(att, notary.PendingAttestation):
-                pending.append((node, att))
-        for child in node.ops.values():
-            walk(child)
-
-    walk(timestamp)
-    return pending
-
-
-def create_ots(hash_hex: str, calendars: Optional[List[str]] = None) -> OTSResult:
+def create_ots(digest: bytes, calendars: Optional[List[str]] = None) -> OTSResult:
     try:
-        client, error = _load_ots_client()
+        client = _OTS_CLIENT
         if not client:
-            return _create_ots_with_calendar(hash_hex, calendars or [])
+            return _create_ots_with_calendar(digest, calendars or [])
         ots_stamp, _ots_verify, Timestamp = client
-        digest = bytes.fromhex(hash_hex)
         timestamp = Timestamp(digest)
         ots_stamp(timestamp)
         ots_bytes = timestamp.serialize()
@@ -218,35 +344,40 @@ def create_ots(hash_hex: str, calendars: Optional[List[str]] = None) -> OTSResul
         return OTSResult(success=False, error=str(exc), info={}, ots_bytes=None)
 
 
-def verify_ots(ots_bytes: bytes, hash_hex: Optional[str] = None) -> OTSResult:
+def verify_ots(ots_bytes: bytes, digest: Optional[bytes] = None) -> OTSResult:
     try:
-        client, error = _load_ots_client()
+        client = _OTS_CLIENT
         if not client:
-            try:
-                from opentimestamps.core.serialize import BytesDeserializationContext  # type: ignore
-                from opentimestamps.core.timestamp import DetachedTimestampFile  # type: ignore
-                from opentimestamps.calendar import RemoteCalendar  # type: ignore
-                from opentimestamps.core import notary  # type: ignore
-            except Exception as exc:
-                return OTSResult(success=False, error=f"opentimestamps core unavailable: {exc}", info={})
-            ctx = BytesDeserializationContext(ots_bytes)
-            detached = DetachedTimestampFile.deserialize(ctx)
-            info: Dict[str, Any] = _collect_attestation_info(detached.timestamp)
-            if hash_hex:
-                expected = bytes.fromhex(hash_hex)
-                if detached.timestamp.msg != expected:
+            core = _OTS
+            if core is None:
+                return OTSResult(success=False, error=_OTS_ERROR, info={})
+            ctx = core.BytesDeserializationContext(ots_bytes)
+            detached = core.DetachedTimestampFile.deserialize(ctx)
+            scan = _scan_timestamp(detached.timestamp)
+            info: Dict[str, Any] = _attestation_summary(scan)
+            if digest:
+                if detached.timestamp.msg != digest:
                     info["hash_match"] = False
                     return OTSResult(success=False, error="hash mismatch", info=info)
-            pending = _collect_pending_attestations(detached.timestamp)
+            pending = scan.pending if scan else []
             upgraded = False
             upgrade_errors: List[str] = []
             calendar_results: List[Dict[str, Any]] = []
             if pending:
-                for node, att in pending:
+                futures = [
+                    _CALENDAR_EXECUTOR.submit(
+                        lambda uri, msg: core.RemoteCalendar(uri).get_timestamp(
+                            msg, timeout=_CALENDAR_TIMEOUT_SECONDS
+                        ),
+                        att.uri,
+                        node.msg,
+                    )
+                    for node, att in pending
+                ]
+                for (node, att), future in zip(pending, futures):
                     uri = att.uri
                     try:
-                        cal = RemoteCalendar(uri)
-                        cal_ts = cal.get_timestamp(node.msg)
+                        cal_ts = future.result()
                         node.merge(cal_ts)
                         upgraded = True
                         calendar_results.append(
@@ -265,8 +396,10 @@ def verify_ots(ots_bytes: bytes, hash_hex: Optional[str] = None) -> OTSResult:
                                 "error": str(exc),
                             }
                         )
-            info = _collect_attestation_info(detached.timestamp)
-            proofs = _collect_blockchain_proofs(detached.timestamp)
+            if upgraded:
+                scan = _scan_timestamp(detached.timestamp)
+                info = _attestation_summary(scan)
+            proofs = _blockchain_proofs(scan)
             if proofs:
                 info["blockchain_proofs"] = proofs
             if upgrade_errors:
@@ -275,27 +408,25 @@ def verify_ots(ots_bytes: bytes, hash_hex: Optional[str] = None) -> OTSResult:
                 info["calendar_results"] = calendar_results
             updated_ots_bytes = None
             if upgraded:
-                from opentimestamps.core.serialize import BytesSerializationContext  # type: ignore
-                new_detached = DetachedTimestampFile(detached.file_hash_op, detached.timestamp)
-                ctx_out = BytesSerializationContext()
+                new_detached = core.DetachedTimestampFile(detached.file_hash_op, detached.timestamp)
+                ctx_out = core.BytesSerializationContext()
                 new_detached.serialize(ctx_out)
                 updated_ots_bytes = ctx_out.getbytes()
-            if hash_hex:
-                expected = bytes.fromhex(hash_hex)
-                if detached.timestamp.msg != expected:
+            if digest:
+                if detached.timestamp.msg != digest:
                     return OTSResult(success=False, error="hash mismatch", info=info)
                 info["hash_match"] = True
             return OTSResult(success=True, error=None, info=info, updated_ots_bytes=updated_ots_bytes)
         _ots_stamp, ots_verify, Timestamp = client
         timestamp = Timestamp.deserialize(ots_bytes)
         result = ots_verify(timestamp)
-        info: Dict[str, Any] = _collect_attestation_info(timestamp)
-        proofs = _collect_blockchain_proofs(timestamp)
+        scan = _scan_timestamp(timestamp)
+        info: Dict[str, Any] = _attestation_summary(scan)
+        proofs = _blockchain_proofs(scan)
         if proofs:
             info["blockchain_proofs"] = proofs
-        if hash_hex:
-            expected = bytes.fromhex(hash_hex)
-            if timestamp.msg != expected:
+        if digest:
+            if timestamp.msg != digest:
                 info["hash_match"] = False
                 return OTSResult(success=False, error="hash mismatch", info=info)
             info["hash_match"] = True
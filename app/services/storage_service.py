@@ -1,5 +1,13 @@
 import os
-from typing import Optional
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+_READ_CACHE_MAX_SIZE = 256
+_READ_CACHE: "OrderedDict[Tuple[str, int, int], bytes]" = OrderedDict()
+_READ_CACHE_LOCK = threading.Lock()
 
 
 def evidence_dir(files_dir: str, hash_value: str) -> str:
@@ -12,38 +20,103 @@ def ensure_evidence_dir(files_dir: str, hash_value: str) -> str:
     return path
 
 
-def save_ots_file(files_dir: str, hash_value: str, content: bytes) -> str:
-    base_dir = ensure_evidence_dir(files_dir, hash_value)
-    target = os.path.join(base_dir, f"{hash_value}.ots")
-    with open(target, "wb") as handle:
-        handle.write(content)
-    return target
+def _write_bytes(path: str, content: bytes) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(content)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
 
 
-def save_tsa_file(files_dir: str, hash_value: str, content: bytes) -> str:
+def save_evidence_files(
+    files_dir: str,
+    hash_value: str,
+    ots_bytes: Optional[bytes] = None,
+    tsr_bytes: Optional[bytes] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    if not ots_bytes and not tsr_bytes:
+        return None, None
     base_dir = ensure_evidence_dir(files_dir, hash_value)
-    target = os.path.join(base_dir, f"{hash_value}.tsr")
-    with open(target, "wb") as handle:
-        handle.write(content)
-    return target
+    ots_path = None
+    tsa_path = None
+    if ots_bytes:
+        ots_path = os.path.join(base_dir, f"{hash_value}.ots")
+        _write_bytes(ots_path, ots_bytes)
+    if tsr_bytes:
+        tsa_path = os.path.join(base_dir, f"{hash_value}.tsr")
+        _write_bytes(tsa_path, tsr_bytes)
+    return ots_path, tsa_path
 
 
 def delete_evidence_files(files_dir: str, hash_value: str) -> None:
     base_dir = evidence_dir(files_dir, hash_value)
-    if not os.path.isdir(base_dir):
+    try:
+        entries = os.scandir(base_dir)
+    except (FileNotFoundError, NotADirectoryError):
         return
-    for name in os.listdir(base_dir):
-        path = os.path.join(base_dir, name)
-        if os.path.isfile(path):
-            os.remove(path)
+    with entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                os.unlink(entry.path)
     try:
         os.rmdir(base_dir)
     except OSError:
         pass
 
 
+def write_file_atomic(path: str, content: bytes) -> None:
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as handle:
+        handle.write(content)
+        tmp_path = handle.name
+    try:
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+
+def _read_bytes(path: str, size: int) -> bytes:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        content = os.read(fd, size)
+        if len(content) < size:
+            chunks = [content]
+            while True:
+                chunk = os.read(fd, size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            content = b"".join(chunks)
+        return content
+    finally:
+        os.close(fd)
+
+
 def read_file(path: Optional[str]) -> Optional[bytes]:
-    if not path or not os.path.isfile(path):
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _READ_CACHE_LOCK:
+        content = _READ_CACHE.get(key)
+        if content is not None:
+            _READ_CACHE.move_to_end(key)
+            return content
+    try:
+        content = _read_bytes(path, st.st_size)
+    except OSError:
         return None
-    with open(path, "rb") as handle:
-        return handle.read()
+    with _READ_CACHE_LOCK:
+        _READ_CACHE[key] = content
+        while len(_READ_CACHE) > _READ_CACHE_MAX_SIZE:
+            _READ_CACHE.popitem(last=False)
+    return content
@@ -3,9 +3,28 @@ import logging
 from dataclasses import dataclass
 from typing import Any, Dict, Optional, Tuple
 
+try:
+    import rfc3161ng  # type: ignore
+    from pyasn1.codec.ber import decoder as ber_decoder  # type: ignore
+    from pyasn1.codec.der import decoder as der_decoder  # type: ignore
+except ImportError as exc:  # pragma: no cover - optional dependency
+    rfc3161ng = None
+    _RFC3161NG_ERROR: Optional[str] = str(exc)
+else:
+    _RFC3161NG_ERROR = None
+
+_REMOTE_TIMESTAMPER = getattr(rfc3161ng, "RemoteTimestamper", None)
+_DECODE_TSR = getattr(rfc3161ng, "decode_timestamp_response", None)
+_GET_TIMESTAMP = getattr(rfc3161ng, "get_timestamp", None)
+_OID_TO_HASH: Dict[str, Any] = getattr(rfc3161ng, "oid_to_hash", {})
+_TS_TOKEN_SPEC = rfc3161ng.TimeStampToken() if rfc3161ng else None
+_TST_INFO_SPEC = rfc3161ng.TSTInfo() if rfc3161ng else None
+
 
 logger = logging.getLogger("app")
 
+_B64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+
 
 @dataclass(frozen=True)
 class TSAResult:
@@ -31,16 +50,13 @@ def _response_to_bytes(response: Any) -> Optional[bytes]:
     return None
 
 
-def create_tsa(hash_hex: str, tsa_url: str) -> TSAResult:
+def create_tsa(digest: bytes, tsa_url: str) -> TSAResult:
     try:
         if not tsa_url:
             return TSAResult(success=False, error="TSA_URL not configured", info={})
-        try:
-            from rfc3161ng import RemoteTimestamper  # type: ignore
-        except ImportError as exc:  # pragma: no cover - optional dependency
-            return TSAResult(success=False, error=str(exc), info={})
-        digest = bytes.fromhex(hash_hex)
-        timestamper = RemoteTimestamper(tsa_url, hashname="sha256")
+        if _REMOTE_TIMESTAMPER is None:
+            return TSAResult(success=False, error=_RFC3161NG_ERROR, info={})
+        timestamper = _REMOTE_TIMESTAMPER(tsa_url, hashname="sha256")
         response = timestamper(digest=digest)
         tsr_bytes = _response_to_bytes(response)
         if not tsr_bytes:
@@ -59,17 +75,15 @@ def create_tsa(hash_hex: str, tsa_url: str) -> TSAResult:
         return TSAResult(success=False, error=str(exc), info={})
 
 
-def verify_tsa(tsr_bytes: bytes, hash_hex: Optional[str] = None) -> TSAResult:
+def verify_tsa(tsr_bytes: bytes, digest: Optional[bytes] = None) -> TSAResult:
     try:
-        try:
-            import rfc3161ng  # type: ignore
-        except ImportError as exc:  # pragma: no cover - optional dependency
-            return TSAResult(success=False, error=str(exc), info={})
+        if rfc3161ng is None:
+            return TSAResult(success=False, error=_RFC3161NG_ERROR, info={})
         info, error = _extract_tsa_info(tsr_bytes)
         if error:
             return TSAResult(success=False, error=error, info=info)
-        if hash_hex:
-            hash_error = _check_tsa_hash(rfc3161ng, tsr_bytes, hash_hex)
+        if digest:
+            hash_error = _check_tsa_hash(tsr_bytes, digest)
             if hash_error:
                 return TSAResult(success=False, error=hash_error, info=info)
         return TSAResult(success=True, error=None, info=info)
@@ -91,9 +105,8 @@ def _decode_tsa_response(decoder, tsr_bytes: bytes):
             parts = text.splitlines()
             b64 = b"".join(line for line in parts if not line.startswith(b"-----"))
             return decoder(base64.b64decode(b64))
-        b64_text = text.replace(b"\n", b"").replace(b"\r", b"")
-        allowed = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
-        if any(ch not in allowed for ch in b64_text):
+        b64_text = text.translate(None, b"\r\n")
+        if b64_text.translate(None, _B64_ALPHABET):
             raise ValueError("tsa response is not base64 or ASN.1 data")
         missing = (-len(b64_text)) % 4
         if missing:
@@ -105,15 +118,12 @@ def _decode_tsa_response(decoder, tsr_bytes: bytes):
 
 
 def _extract_tsa_info(tsr_bytes: bytes) -> Tuple[Dict[str, Any], Optional[str]]:
-    try:
-        import rfc3161ng  # type: ignore
-    except ImportError as exc:  # pragma: no cover - optional dependency
-        return {}, str(exc)
+    if rfc3161ng is None:
+        return {}, _RFC3161NG_ERROR
     info: Dict[str, Any] = {}
-    decoder = getattr(rfc3161ng, "decode_timestamp_response", None)
-    if decoder:
+    if _DECODE_TSR:
         try:
-            tsr = _decode_tsa_response(decoder, tsr_bytes)
+            tsr = _decode_tsa_response(_DECODE_TSR, tsr_bytes)
             status = getattr(tsr, "status", None)
             if status is not None:
                 info["status"] = str(status)
@@ -124,10 +134,9 @@ def _extract_tsa_info(tsr_bytes: bytes) -> Tuple[Dict[str, Any], Optional[str]]:
             return info, None
         except Exception:
             pass
-    token_parser = getattr(rfc3161ng, "get_timestamp", None)
-    if callable(token_parser):
+    if callable(_GET_TIMESTAMP):
         try:
-            timestamp = token_parser(tsr_bytes)
+            timestamp = _GET_TIMESTAMP(tsr_bytes)
             info["time"] = str(timestamp)
             info["format"] = "tst"
             return info, None
@@ -136,16 +145,12 @@ def _extract_tsa_info(tsr_bytes: bytes) -> Tuple[Dict[str, Any], Optional[str]]:
     return info, "invalid tsa response: decoder unavailable"
 
 
-def _check_tsa_hash(rfc3161ng, tsr_bytes: bytes, hash_hex: str) -> Optional[str]:
-    try:
-        digest = bytes.fromhex(hash_hex)
-    except ValueError:
-        return "invalid hash hex"
+def _check_tsa_hash(tsr_bytes: bytes, digest: bytes) -> Optional[str]:
     try:
-        tst = _extract_tst_token(rfc3161ng, tsr_bytes)
+        tst = _extract_tst_token(tsr_bytes)
         if tst is None:
             return "invalid tsa response: missing timestamp token"
-        imprint, debug_info = _extract_message_imprint(rfc3161ng, tst)
+        imprint, debug_info = _extract_message_imprint(tst)
         if imprint is None:
             return "invalid tsa response: missing message imprint"
         if imprint != digest:
@@ -155,36 +160,33 @@ def _check_tsa_hash(rfc3161ng, tsr_bytes: bytes, hash_hex: str) -> Optional[str]
         return f"hash mismatch: {exc}"
 
 
-def _extract_tst_token(rfc3161ng, tsr_bytes: bytes):
-    decoder = getattr(rfc3161ng, "decode_timestamp_response", None)
-    if decoder:
+def _extract_tst_token(tsr_bytes: bytes):
+    if _DECODE_TSR:
         try:
-            tsr = _decode_tsa_response(decoder, tsr_bytes)
+            tsr = _decode_tsa_response(_DECODE_TSR, tsr_bytes)
             tst = getattr(tsr, "time_stamp_token", None)
             if tst is not None:
                 return tst
         except Exception:
             pass
     try:
-        from pyasn1.codec.der import decoder as der_decoder  # type: ignore
-        return der_decoder.decode(tsr_bytes, asn1Spec=rfc3161ng.TimeStampToken())[0]
+        return der_decoder.decode(tsr_bytes, asn1Spec=_TS_TOKEN_SPEC)[0]
     except Exception:
         return None
 
 
-def _extract_message_imprint(rfc3161ng, tst) -> Tuple[Optional[bytes], Dict[str, Any]]:
+def _extract_message_imprint(tst) -> Tuple[Optional[bytes], Dict[str, Any]]:
     try:
         debug_info: Dict[str, Any] = {}
         tst_info = None
         if hasattr(tst, "tst_info"):
             tst_info = tst.tst_info
         else:
-            from pyasn1.codec.ber import decoder as ber_decoder  # type: ignore
             content = tst.getComponentByName("content").getComponentByName("contentInfo").getComponentByName("content")
             inner, substrate = ber_decoder.decode(bytes(content))
             if substrate:
                 return None, debug_info
-            tst_info, substrate = ber_decoder.decode(bytes(inner), asn1Spec=rfc3161ng.TSTInfo())
+            tst_info, substrate = ber_decoder.decode(bytes(inner), asn1Spec=_TST_INFO_SPEC)
             if substrate:
                 return None, debug_info
         if tst_info is None:
@@ -197,7 +199,7 @@ def _extract_message_imprint(rfc3161ng, tst) -> Tuple[Optional[bytes], Dict[str,
             if algorithm is not None:
                 oid = str(algorithm.getComponentByName("algorithm"))
                 debug_info["hash_oid"] = oid
-                debug_info["hash_alg"] = rfc3161ng.oid_to_hash.get(oid)
+                debug_info["hash_alg"] = _OID_TO_HASH.get(oid)
         except Exception:
             pass
         digest_bytes = bytes(message_imprint.getComponentByName("hashedMessage"))
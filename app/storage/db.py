@@ -1,7 +1,11 @@
 import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List
+from functools import lru_cache
+from typing import Iterator, Tuple
 
 
 @dataclass(frozen=True)
@@ -11,14 +15,16 @@ class Migration:
     sql: str
 
 
+@lru_cache(maxsize=1)
 def _migration_dir() -> str:
     return os.path.abspath(
         os.path.join(os.path.dirname(__file__), "..", "migrations")
     )
 
 
-def _load_migrations() -> List[Migration]:
-    migrations: List[Migration] = []
+@lru_cache(maxsize=1)
+def _load_migrations() -> Tuple[Migration, ...]:
+    migrations = []
     for name in sorted(os.listdir(_migration_dir())):
         if not name.endswith(".sql"):
             continue
@@ -29,7 +35,12 @@ def _load_migrations() -> List[Migration]:
         path = os.path.join(_migration_dir(), name)
         with open(path, "r", encoding="utf-8") as handle:
             migrations.append(Migration(version=version, filename=name, sql=handle.read()))
-    return migrations
+    return tuple(migrations)
+
+
+def _latest_version() -> int:
+    migrations = _load_migrations()
+    return migrations[-1].version if migrations else 0
 
 
 def _ensure_schema_table(conn: sqlite3.Connection) -> None:
@@ -65,6 +76,8 @@ def migrate(db_path: str) -> None:
         conn.execute("PRAGMA foreign_keys = ON")
         _ensure_schema_table(conn)
         current = _current_version(conn)
+        if current >= _latest_version():
+            return
         pending = [m for m in _load_migrations() if m.version > current]
         for migration in pending:
             _apply_migration(conn, migration)
@@ -73,9 +86,77 @@ def migrate(db_path: str) -> None:
         conn.close()
 
 
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -64000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA busy_timeout = 30000",
+    "PRAGMA foreign_keys = ON",
+)
+
+
 def get_connection(db_path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn = sqlite3.connect(
+        db_path,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=512,
+    )
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    for pragma in _CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
+
+class ConnectionPool:
+    def __init__(self, db_path: str, readers: int = 4, checkout_timeout: float = 2.0) -> None:
+        self._db_path = db_path
+        self._checkout_timeout = checkout_timeout
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(max(1, readers)):
+            self._readers.put(get_connection(db_path))
+        self._writer = get_connection(db_path)
+        self._write_lock = threading.Lock()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._readers.get(timeout=self._checkout_timeout)
+        except queue.Empty:
+            conn = get_connection(self._db_path)
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                if self._writer.in_transaction:
+                    self._writer.rollback()
+                raise
+            if self._writer.in_transaction:
+                self._writer.commit()
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        with self._write_lock:
+            self._writer.close()
+
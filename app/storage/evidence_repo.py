@@ -1,23 +1,147 @@
 import sqlite3
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
+_CACHE_TTL_SECONDS = 5.0
+_CACHE_MAX_SIZE = 4096
+_CACHE: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_TX_STATE = threading.local()
 
-def fetch_by_hash(conn: sqlite3.Connection, hash_value: str) -> Optional[Dict[str, Any]]:
-    row = conn.execute("SELECT * FROM evidences WHERE hash = ?", (hash_value,)).fetchone()
+_COLUMNS = "hash, ots_status, tsa_status, ots_path, tsa_path, created_at, updated_at"
+
+
+def _cache_get(hash_value: str) -> Optional[Dict[str, Any]]:
+    with _CACHE_LOCK:
+        entry = _CACHE.get(hash_value)
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at < time.monotonic():
+            del _CACHE[hash_value]
+            return None
+        _CACHE.move_to_end(hash_value)
+        return record
+
+
+def _cache_put(hash_value: str, record: Dict[str, Any]) -> None:
+    with _CACHE_LOCK:
+        _CACHE[hash_value] = (time.monotonic() + _CACHE_TTL_SECONDS, record)
+        _CACHE.move_to_end(hash_value)
+        while len(_CACHE) > _CACHE_MAX_SIZE:
+            _CACHE.popitem(last=False)
+
+
+def _cache_invalidate(hash_value: str) -> None:
+    with _CACHE_LOCK:
+        _CACHE.pop(hash_value, None)
+
+
+def _mark_changed(hash_value: str) -> None:
+    _cache_invalidate(hash_value)
+    pending: Optional[Set[str]] = getattr(_TX_STATE, "pending", None)
+    if pending is not None:
+        pending.add(hash_value)
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    if getattr(_TX_STATE, "pending", None) is not None:
+        yield conn
+        return
+    pending: Set[str] = set()
+    _TX_STATE.pending = pending
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    else:
+        if conn.in_transaction:
+            conn.commit()
+    finally:
+        _TX_STATE.pending = None
+        for hash_value in pending:
+            _cache_invalidate(hash_value)
+
+
+def fetch_by_hash(
+    conn: sqlite3.Connection, hash_value: str, use_cache: bool = True
+) -> Optional[Dict[str, Any]]:
+    if use_cache:
+        cached = _cache_get(hash_value)
+        if cached is not None:
+            return dict(cached)
+    row = conn.execute(f"SELECT {_COLUMNS} FROM evidences WHERE hash = ?", (hash_value,)).fetchone()
+    if not row:
+        return None
+    record = dict(row)
+    _cache_put(hash_value, record)
+    return dict(record)
+
+
+def fetch_paths(conn: sqlite3.Connection, hash_value: str) -> Optional[Dict[str, Any]]:
+    cached = _cache_get(hash_value)
+    if cached is not None:
+        return {key: cached[key] for key in ("ots_status", "tsa_status", "ots_path", "tsa_path")}
+    row = conn.execute(
+        "SELECT ots_status, tsa_status, ots_path, tsa_path FROM evidences WHERE hash = ?",
+        (hash_value,),
+    ).fetchone()
     return dict(row) if row else None
 
 
+def iter_all(conn: sqlite3.Connection) -> Iterator[Dict[str, Any]]:
+    cursor = conn.execute(f"SELECT {_COLUMNS} FROM evidences ORDER BY created_at DESC, hash DESC")
+    return map(dict, cursor)
+
+
 def list_all(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
-    rows = conn.execute("SELECT * FROM evidences ORDER BY created_at DESC").fetchall()
+    return list(iter_all(conn))
+
+
+def list_page(
+    conn: sqlite3.Connection,
+    after_created_at: Optional[str],
+    after_hash: Optional[str],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    if after_created_at is None:
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM evidences ORDER BY created_at DESC, hash DESC LIMIT ?",
+            (limit,),
+        )
+    else:
+        rows = conn.execute(
+            f"""
+            SELECT {_COLUMNS} FROM evidences
+            WHERE (created_at, hash) < (?, ?)
+            ORDER BY created_at DESC, hash DESC
+            LIMIT ?
+            """,
+            (after_created_at, after_hash or "", limit),
+        )
     return [dict(row) for row in rows]
 
 
-def insert_or_ignore(conn: sqlite3.Connection, payload: Dict[str, Any]) -> None:
-    conn.execute(
-        """
-        INSERT OR IGNORE INTO evidences (
-            hash, ots_status, tsa_status, ots_path, tsa_path, created_at, updated_at
-        ) VALUES (?, ?, ?, ?, ?, datetime('now'), datetime('now'))
+def upsert_with_statuses(conn: sqlite3.Connection, payload: Dict[str, Any]) -> Dict[str, Any]:
+    row = conn.execute(
+        f"""
+        INSERT INTO evidences ({_COLUMNS})
+        VALUES (?, ?, ?, ?, ?, datetime('now'), datetime('now'))
+        ON CONFLICT(hash) DO UPDATE SET
+            ots_status = excluded.ots_status,
+            tsa_status = excluded.tsa_status,
+            ots_path = excluded.ots_path,
+            tsa_path = excluded.tsa_path,
+            updated_at = datetime('now')
+        RETURNING {_COLUMNS}
         """,
         (
             payload["hash"],
@@ -26,29 +150,11 @@ def insert_or_ignore(conn: sqlite3.Connection, payload: Dict[str, Any]) -> None:
             payload.get("ots_path"),
             payload.get("tsa_path"),
         ),
-    )
-    conn.commit()
-
-
-def update_statuses(
-    conn: sqlite3.Connection,
-    hash_value: str,
-    ots_status: str,
-    tsa_status: str,
-    ots_path: Optional[str],
-    tsa_path: Optional[str],
-) -> None:
-    conn.execute(
-        """
-        UPDATE evidences
-        SET ots_status = ?, tsa_status = ?, ots_path = ?, tsa_path = ?, updated_at = datetime('now')
-        WHERE hash = ?
-        """,
-        (ots_status, tsa_status, ots_path, tsa_path, hash_value),
-    )
-    conn.commit()
+    ).fetchone()
+    _mark_changed(payload["hash"])
+    return dict(row)
 
 
 def delete_by_hash(conn: sqlite3.Connection, hash_value: str) -> None:
     conn.execute("DELETE FROM evidences WHERE hash = ?", (hash_value,))
-    conn.commit()
+    _mark_changed(hash_value)
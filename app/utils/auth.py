@@ -1,5 +1,7 @@
 import base64
+import hmac
 import secrets
+from functools import lru_cache
 from typing import Optional, Tuple
 
 
@@ -27,3 +29,15 @@ def check_basic_auth(header_value: Optional[str], username: str, password: str)
     return secrets.compare_digest(candidate_user, username) and secrets.compare_digest(
         candidate_pass, password
     )
+
+
+@lru_cache(maxsize=1)
+def _expected_credentials(username: str, password: str) -> Tuple[bytes, bytes]:
+    return username.encode("utf-8"), password.encode("utf-8")
+
+
+def check_credentials(username: str, password: str, expected_user: str, expected_pass: str) -> bool:
+    user_bytes, pass_bytes = _expected_credentials(expected_user, expected_pass)
+    user_ok = hmac.compare_digest(username.encode("utf-8"), user_bytes)
+    pass_ok = hmac.compare_digest(password.encode("utf-8"), pass_bytes)
+    return user_ok & pass_ok
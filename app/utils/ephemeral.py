@@ -0,0 +1,84 @@
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional, Tuple
+
+EPHEMERAL_TTL_SECONDS = 60 * 30
+EPHEMERAL_MAX_ITEMS = 1024
+EPHEMERAL_MAX_BYTES = 64 * 1024 * 1024
+_SWEEP_INTERVAL_SECONDS = 60
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_-]{22}")
+_LOCK = threading.Lock()
+_next_sweep = 0.0
+_items = 0
+_bytes = 0
+
+
+def _sweep(ephemeral_dir: str, now: float) -> None:
+    global _items, _bytes
+    items = 0
+    total = 0
+    with os.scandir(ephemeral_dir) as entries:
+        for entry in entries:
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if st.st_mtime + EPHEMERAL_TTL_SECONDS < now:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            items += 1
+            try:
+                with os.scandir(entry.path) as files:
+                    total += sum(item.stat().st_size for item in files)
+            except OSError:
+                continue
+    _items, _bytes = items, total
+
+
+def put_ephemeral(ephemeral_dir: str, filename: str, content: bytes) -> Optional[str]:
+    global _next_sweep, _items, _bytes
+    now = time.time()
+    with _LOCK:
+        if now >= _next_sweep:
+            try:
+                _sweep(ephemeral_dir, now)
+            except OSError:
+                return None
+            _next_sweep = now + _SWEEP_INTERVAL_SECONDS
+        if _items >= EPHEMERAL_MAX_ITEMS or _bytes + len(content) > EPHEMERAL_MAX_BYTES:
+            return None
+        _items += 1
+        _bytes += len(content)
+    token = secrets.token_urlsafe(16)
+    tmp_dir = None
+    try:
+        tmp_dir = tempfile.mkdtemp(prefix=".", dir=ephemeral_dir)
+        with open(os.path.join(tmp_dir, filename), "wb") as handle:
+            handle.write(content)
+        os.rename(tmp_dir, os.path.join(ephemeral_dir, token))
+    except (OSError, ValueError):
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+    return token
+
+
+def get_ephemeral(ephemeral_dir: str, token: str) -> Optional[Tuple[str, str]]:
+    if not _TOKEN_RE.fullmatch(token):
+        return None
+    path = os.path.join(ephemeral_dir, token)
+    try:
+        if os.stat(path).st_mtime + EPHEMERAL_TTL_SECONDS < time.time():
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        names = os.listdir(path)
+    except OSError:
+        return None
+    if len(names) != 1:
+        return None
+    return os.path.join(path, names[0]), names[0]
@@ -1,43 +1,226 @@
+import gc
 import logging
 import logging.config
 import os
+import queue
+import threading
+import weakref
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
-from typing import Dict
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
+
+from app.utils.locks import file_lock
+
+_HANDLER_FILES = {
+    "app_file": "app.log",
+    "error_file": "error.log",
+    "access_file": "access.log",
+    "ops_file": "ops.log",
+}
+LOG_FILE_NAMES = tuple(_HANDLER_FILES.values())
+_LOG_BUFFER_SIZE = 65536
 
 
 class RangeRotatingFileHandler(RotatingFileHandler):
+    _written = 0
+    _pending = 0
+    _force_flush = False
+
     def __init__(self, filename: str, maxBytes: int = 0, **kwargs) -> None:
         super().__init__(filename, maxBytes=maxBytes, backupCount=0, **kwargs)
-        self._range_start = self._initial_start_date()
+        base = os.path.basename(self.baseFilename)
+        self._name_prefix = base[:-4] if base.endswith(".log") else base
+        self._name_dir = os.path.dirname(self.baseFilename)
+        self._set_range_start(self._initial_start_date())
+
+    def _open(self):
+        stream = open(
+            self.baseFilename,
+            self.mode,
+            buffering=_LOG_BUFFER_SIZE,
+            encoding=self.encoding,
+            errors=self.errors,
+        )
+        self._written = stream.seek(0, 2)
+        return stream
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        msg = "%s\n" % self.format(record)
+        pending = len(msg.encode(self.encoding or "utf-8", self.errors or "strict"))
+        if self._written + pending >= self.maxBytes:
+            self.stream.flush()
+            self._sync_written()
+        self._pending = pending
+        return self._written + pending >= self.maxBytes
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._force_flush = record.levelno >= logging.ERROR
+        super().emit(record)
+        self._written += self._pending
+        self._pending = 0
+
+    def flush(self) -> None:
+        if self._force_flush:
+            self._force_flush = False
+            self.flush_buffer()
+
+    def flush_buffer(self) -> None:
+        super().flush()
+        self._sync_written()
+
+    def _sync_written(self) -> None:
+        if self.stream is not None:
+            self._written = os.fstat(self.stream.fileno()).st_size
+            self._pending = 0
 
     def _initial_start_date(self) -> datetime:
-        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
-            ts = os.path.getctime(self.baseFilename)
-            return datetime.fromtimestamp(ts)
+        try:
+            st = os.stat(self.baseFilename)
+        except OSError:
+            st = None
+        self._has_content = st is not None and st.st_size > 0
+        if self._has_content:
+            return datetime.fromtimestamp(st.st_ctime)
         return datetime.now()
 
-    def _range_name(self, start: datetime, end: datetime) -> str:
-        base = os.path.basename(self.baseFilename)
-        prefix = base[:-4] if base.endswith(".log") else base
-        return f"{prefix}-{start:%Y%m%d}-{end:%Y%m%d}.log"
+    def _set_range_start(self, start: datetime) -> None:
+        self._range_start = start
+        self._range_start_str = start.strftime("%Y%m%d")
+
+    def _range_name(self, end: datetime) -> str:
+        return f"{self._name_prefix}-{self._range_start_str}-{end:%Y%m%d}.log"
 
     def doRollover(self) -> None:
+        has_content = self._has_content
+        inode = None
         if self.stream:
+            has_content = self.stream.tell() > 0
+            inode = os.fstat(self.stream.fileno()).st_ino
             self.stream.close()
             self.stream = None
-        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+        if has_content:
             end_date = datetime.now()
-            target = os.path.join(
-                os.path.dirname(self.baseFilename),
-                self._range_name(self._range_start, end_date),
-            )
-            os.replace(self.baseFilename, target)
-        self._range_start = datetime.now()
+            target = os.path.join(self._name_dir, self._range_name(end_date))
+            with file_lock(self.baseFilename + ".lock"):
+                try:
+                    if inode is None or os.stat(self.baseFilename).st_ino == inode:
+                        os.replace(self.baseFilename, target)
+                except FileNotFoundError:
+                    pass
+        self._set_range_start(datetime.now())
+        self._has_content = False
         if not self.delay:
             self.stream = self._open()
 
 
+_LOG_QUEUE: "queue.SimpleQueue" = queue.SimpleQueue()
+_LISTENER_LOCK = threading.Lock()
+_LISTENER: Optional[QueueListener] = None
+
+
+class _DispatchingQueueListener(QueueListener):
+    def __init__(self, log_queue: "queue.SimpleQueue") -> None:
+        super().__init__(log_queue)
+        self._dirty: set = set()
+
+    def handle(self, item) -> None:
+        owner, record = item
+        if owner is None:
+            self._flush_dirty()
+            record.set()
+            return
+        owner.dispatch(record)
+        self._dirty.add(owner)
+        if self.queue.empty():
+            self._flush_dirty()
+
+    def _flush_dirty(self) -> None:
+        for dirty in self._dirty:
+            dirty.flush_target()
+        self._dirty.clear()
+
+
+def _enqueue(item) -> None:
+    global _LISTENER
+    with _LISTENER_LOCK:
+        if _LISTENER is None:
+            _LISTENER = _DispatchingQueueListener(_LOG_QUEUE)
+            _LISTENER.start()
+        _LOG_QUEUE.put_nowait(item)
+
+
+def _drain_listener() -> None:
+    with _LISTENER_LOCK:
+        listener = _LISTENER
+        if listener is None or threading.current_thread() is listener._thread:
+            return
+        done = threading.Event()
+        _LOG_QUEUE.put_nowait((None, done))
+    done.wait(5)
+
+
+def _stop_listener() -> None:
+    global _LISTENER
+    with _LISTENER_LOCK:
+        listener, _LISTENER = _LISTENER, None
+        if listener is not None:
+            listener.stop()
+
+
+_HANDLERS_LOCK = threading.Lock()
+_HANDLERS_BY_PATH: Dict[str, List["QueuedFileHandler"]] = {}
+
+
+class QueuedFileHandler(QueueHandler):
+    def __init__(self, filename: str, maxBytes: int = 0, encoding: Optional[str] = None) -> None:
+        super().__init__(_LOG_QUEUE)
+        self.target: Optional[RangeRotatingFileHandler] = RangeRotatingFileHandler(
+            filename, maxBytes=maxBytes, encoding=encoding
+        )
+        self.baseFilename = self.target.baseFilename
+        self.owners: "weakref.WeakSet[logging.Logger]" = weakref.WeakSet()
+        self._target_lock = threading.Lock()
+        with _HANDLERS_LOCK:
+            _HANDLERS_BY_PATH.setdefault(self.baseFilename, []).append(self)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        _enqueue((self, record))
+
+    def dispatch(self, record: logging.LogRecord) -> None:
+        with self._target_lock:
+            if self.target is not None:
+                self.target.handle(record)
+
+    def flush_target(self) -> None:
+        with self._target_lock:
+            if self.target is not None:
+                self.target.flush_buffer()
+
+    def close(self) -> None:
+        with _HANDLERS_LOCK:
+            registered = _HANDLERS_BY_PATH.get(self.baseFilename)
+            if registered and self in registered:
+                registered.remove(self)
+                if not registered:
+                    del _HANDLERS_BY_PATH[self.baseFilename]
+            idle = not _HANDLERS_BY_PATH
+        if idle:
+            _stop_listener()
+        else:
+            _drain_listener()
+        with self._target_lock:
+            target, self.target = self.target, None
+            if target is not None:
+                target.close()
+        super().close()
+
+
+@lru_cache(maxsize=1)
 def _log_max_bytes() -> int:
     value = os.environ.get("LOG_MAX_BYTES", "5242880")
     try:
@@ -47,13 +230,7 @@ def _log_max_bytes() -> int:
 
 
 def build_logging_config(logs_dir: str) -> Dict:
-    os.makedirs(logs_dir, exist_ok=True)
-    app_log = os.path.join(logs_dir, "app.log")
-    error_log = os.path.join(logs_dir, "error.log")
-    access_log = os.path.join(logs_dir, "access.log")
-    ops_log = os.path.join(logs_dir, "ops.log")
     max_bytes = _log_max_bytes()
-
     return {
         "version": 1,
         "disable_existing_loggers": False,
@@ -63,34 +240,14 @@ def build_logging_config(logs_dir: str) -> Dict:
             },
         },
         "handlers": {
-            "app_file": {
-                "()": "app.utils.logging_config.RangeRotatingFileHandler",
-                "filename": app_log,
-                "formatter": "standard",
-                "encoding": "utf-8",
-                "maxBytes": max_bytes,
-            },
-            "error_file": {
-                "()": "app.utils.logging_config.RangeRotatingFileHandler",
-                "filename": error_log,
-                "formatter": "standard",
-                "encoding": "utf-8",
-                "maxBytes": max_bytes,
-            },
-            "access_file": {
-                "()": "app.utils.logging_config.RangeRotatingFileHandler",
-                "filename": access_log,
+            name: {
+                "()": "app.utils.logging_config.QueuedFileHandler",
+                "filename": os.path.join(logs_dir, filename),
                 "formatter": "standard",
                 "encoding": "utf-8",
                 "maxBytes": max_bytes,
-            },
-            "ops_file": {
-                "()": "app.utils.logging_config.RangeRotatingFileHandler",
-                "filename": ops_log,
-                "formatter": "standard",
-                "encoding": "utf-8",
-                "maxBytes": max_bytes,
-            },
+            }
+            for name, filename in _HANDLER_FILES.items()
         },
         "loggers": {
             "app": {"handlers": ["app_file"], "level": "INFO"},
@@ -102,24 +259,42 @@ def build_logging_config(logs_dir: str) -> Dict:
     }
 
 
+def _disable_unused_record_fields() -> None:
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    logging._srcfile = None
+
+
 def configure_logging(logs_dir: str) -> None:
-    logging.config.dictConfig(build_logging_config(logs_dir))
+    _disable_unused_record_fields()
+    os.makedirs(logs_dir, exist_ok=True)
+    config = build_logging_config(logs_dir)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        logging.config.dictConfig(config)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    loggers = [logging.getLogger()] + [logging.getLogger(name) for name in config["loggers"]]
+    for logger in loggers:
+        for handler in logger.handlers:
+            if isinstance(handler, QueuedFileHandler):
+                handler.owners.add(logger)
 
 
 def close_log_handlers(target_path: str) -> None:
-    loggers = [logging.getLogger()]
-    loggers.extend(
-        [logger for logger in logging.root.manager.loggerDict.values() if hasattr(logger, "handlers")]
-    )
-    for logger in loggers:
-        handlers = getattr(logger, "handlers", [])
-        for handler in list(handlers):
-            filename = getattr(handler, "baseFilename", None)
-            if filename and os.path.abspath(filename) == os.path.abspath(target_path):
-                try:
-                    handler.close()
-                finally:
-                    try:
-                        logger.removeHandler(handler)
-                    except Exception:
-                        pass
+    with _HANDLERS_LOCK:
+        handlers = _HANDLERS_BY_PATH.pop(os.path.abspath(target_path), [])
+    for handler in handlers:
+        try:
+            handler.close()
+        finally:
+            for logger in list(handler.owners):
+                logger.removeHandler(handler)
+
+
+def close_all_log_handlers(logs_dir: str) -> None:
+    for name in LOG_FILE_NAMES:
+        close_log_handlers(os.path.join(logs_dir, name))
@@ -1,7 +1,13 @@
 import os
-from typing import Iterable
+from typing import Iterable, Set
+
+_ENSURED: Set[str] = set()
 
 
 def ensure_dirs(paths: Iterable[str]) -> None:
     for path in paths:
-        os.makedirs(path, exist_ok=True)
+        key = os.fspath(path)
+        if key in _ENSURED:
+            continue
+        os.makedirs(key, exist_ok=True)
+        _ENSURED.add(key)
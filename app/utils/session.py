@@ -1,30 +1,83 @@
+import base64
+import re
 import secrets
+import threading
 import time
-from typing import Dict, Optional
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+
+from app.config import load_settings
 
 SESSION_TTL_SECONDS = 60 * 60 * 12
-_SESSIONS: Dict[str, Dict[str, object]] = {}
+_REDIS_KEY_PREFIX = "sess:"
+_TOKEN_BYTES = 32
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_-]{43}")
+
+
+class Session(NamedTuple):
+    expires_at: float
+    user: str
+
+
+_SESSIONS: "OrderedDict[str, Session]" = OrderedDict()
+_LOCK = threading.Lock()
+_monotonic = time.monotonic
+_sessions_get = _SESSIONS.get
+_sessions_pop = _SESSIONS.pop
+
+
+@lru_cache(maxsize=1)
+def _redis_client():
+    settings = load_settings()
+    if settings.session_backend != "redis":
+        return None
+    import redis  # type: ignore
+
+    pool = redis.ConnectionPool.from_url(settings.redis_url, decode_responses=True)
+    return redis.Redis(connection_pool=pool)
 
 
 def create_session(username: str) -> str:
-    token = secrets.token_urlsafe(32)
-    _SESSIONS[token] = {"expires_at": time.time() + SESSION_TTL_SECONDS, "user": username}
+    token = base64.urlsafe_b64encode(secrets.token_bytes(_TOKEN_BYTES)).rstrip(b"=").decode("ascii")
+    client = _redis_client()
+    if client is not None:
+        client.set(_REDIS_KEY_PREFIX + token, username, ex=SESSION_TTL_SECONDS)
+        return token
+    now = _monotonic()
+    with _LOCK:
+        while _SESSIONS:
+            oldest = next(iter(_SESSIONS.values()))
+            if oldest.expires_at >= now:
+                break
+            _SESSIONS.popitem(last=False)
+        _SESSIONS[token] = Session(now + SESSION_TTL_SECONDS, username)
     return token
 
 
 def get_session(token: Optional[str]) -> Optional[Dict[str, object]]:
-    if not token:
+    if not token or len(token) != 43 or not _TOKEN_RE.fullmatch(token):
         return None
-    session = _SESSIONS.get(token)
-    if not session:
+    client = _redis_client()
+    if client is not None:
+        user = client.get(_REDIS_KEY_PREFIX + token)
+        return {"user": user} if user is not None else None
+    session = _sessions_get(token)
+    if session is None:
         return None
-    if session["expires_at"] < time.time():
-        _SESSIONS.pop(token, None)
+    if session.expires_at < _monotonic():
+        with _LOCK:
+            _sessions_pop(token, None)
         return None
-    return session
+    return {"user": session.user}
 
 
 def delete_session(token: Optional[str]) -> None:
     if not token:
         return
-    _SESSIONS.pop(token, None)
+    client = _redis_client()
+    if client is not None:
+        client.delete(_REDIS_KEY_PREFIX + token)
+        return
+    with _LOCK:
+        _sessions_pop(token, None)